@@ -1,40 +1,191 @@
-import re
+import aiohttp
 import json
 import logging
+import re
+from functools import lru_cache
 from sanic import Blueprint, response
 from sanic.request import Request
-from slackclient import SlackClient
-from typing import Text, Optional, List
+from typing import Text, Optional, List, Dict, Any
 
 from rasa.core.channels import InputChannel
 from rasa.core.channels.channel import UserMessage, OutputChannel
+from rasa.core.constants import DEFAULT_REQUEST_TIMEOUT
+
+try:
+    # faster parser, installed alongside sanic on most platforms
+    from ujson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 logger = logging.getLogger(__name__)
 
+SLACK_API_URL = "https://slack.com/api/"
+
+# maximum number of simultaneous connections a bot keeps open to slack
+DEFAULT_CONNECTION_LIMIT = 32
+
+
+def _convert_to_slack_buttons(buttons):
+    slack_buttons = []
+    for b in buttons:
+        payload = b["payload"]
+        slack_buttons.append(
+            {"text": b["title"], "name": payload, "value": payload, "type": "button"}
+        )
+    return slack_buttons
+
+
+def _get_text_from_slack_buttons(buttons):
+    return "".join(b.get("title") or "" for b in buttons)
+
+
+def _is_user_message(slack_event):
+    event = slack_event.get("event")
+    return (
+        event
+        and event.get("type") in ("message", "app_mention")
+        and event.get("text")
+        and not event.get("bot_id")
+    )
+
+
+def _is_interactive_message(payload):
+    return payload["type"] == "interactive_message"
+
+
+def _is_button(payload):
+    return payload["actions"][0]["type"] == "button"
+
+
+def _is_button_reply_parsed(payload):
+    return _is_interactive_message(payload) and _is_button(payload)
+
 
-class SlackBot(SlackClient, OutputChannel):
+def _get_button_reply_parsed(payload):
+    return payload["actions"][0]["name"]
+
+
+@lru_cache(maxsize=1024)
+def _mention_patterns(uid):
+    """Compile the patterns used to strip mentions of ``uid`` from a message."""
+
+    mention = re.escape("<@{}>".format(uid))
+    # heuristic to format majority cases OK
+    # can be adjusted to taste later if needed,
+    # but is a good first approximation
+    return (
+        (re.compile(mention + r"\s"), ""),
+        (re.compile(r"\s" + mention), ""),
+        # a bit arbitrary but probably OK
+        (re.compile(mention), " "),
+    )
+
+
+def _sanitize_user_message(text, uids_to_remove):
+    """Remove superfluous/wrong/problematic tokens from a message.
+
+    Probably a good starting point for pre-formatting of user-provided text
+    to make NLU's life easier in case they go funky to the power of extreme
+
+    In the current state will just drop self-mentions of bot itself
+
+    Args:
+        text: raw message as sent from slack
+        uids_to_remove: a list of user ids to remove from the content
+
+    Returns:
+        str: parsed and cleaned version of the input text
+    """
+    for uid_to_remove in uids_to_remove:
+        for pattern, replacement in _mention_patterns(uid_to_remove):
+            text = pattern.sub(replacement, text)
+
+    return text.strip()  # drop extra spaces at beginning and end
+
+
+def _ok_response():
+    # responses can't be shared between requests as response middlewares
+    # (e.g. the cors extension) add request specific headers to them
+    return response.text("")
+
+
+def _no_retry_response():
+    return response.text(None, status=201, headers={"X-Slack-No-Retry": "1"})
+
+
+class SlackBot(OutputChannel):
     """A Slack communication channel"""
 
     @classmethod
     def name(cls):
         return "slack"
 
-    def __init__(self, token: Text, slack_channel: Optional[Text] = None) -> None:
+    def __init__(
+        self,
+        token: Text,
+        slack_channel: Optional[Text] = None,
+        connection_limit: int = DEFAULT_CONNECTION_LIMIT,
+    ) -> None:
 
+        self.token = token
         self.slack_channel = slack_channel
-        super(SlackBot, self).__init__(token)
+        self.connection_limit = connection_limit
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # the session is created lazily as it needs to be bound to the
+        # running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={"Authorization": "Bearer {}".format(self.token)},
+                connector=aiohttp.TCPConnector(limit=self.connection_limit),
+            )
+        return self._session
+
+    async def _api_call(self, method: Text, **payload) -> Dict[Text, Any]:
+        # same encoding as the slack web api expects for form posts:
+        # structured values (e.g. attachments) are sent as json strings and
+        # unset values are left out instead of being sent as "None"
+        data = {
+            k: json.dumps(v) if isinstance(v, (list, dict)) else v
+            for k, v in payload.items()
+            if v is not None
+        }
+
+        async with self._get_session().post(
+            SLACK_API_URL + method, data=data, timeout=DEFAULT_REQUEST_TIMEOUT
+        ) as resp:
+            return await resp.json()
+
+    async def api_call(self, method: Text, **kwargs) -> Dict[Text, Any]:
+        """Call a method of the Slack Web API, e.g. ``chat.postMessage``."""
+
+        return await self._api_call(method, **kwargs)
+
+    async def close(self) -> None:
+        """Close the underlying http session and its connections.
+
+        Needs to be awaited once the bot isn't used anymore, unless it is
+        the output channel managed by ``SlackInput``.
+        """
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
     async def send_text_message(self, recipient_id, message):
         recipient = self.slack_channel or recipient_id
+        # the parts are posted one after another, slack shows messages in the
+        # order they arrive and concurrent posts could overtake each other
         for message_part in message.split("\n\n"):
-            super(SlackBot, self).api_call(
+            await self._api_call(
                 "chat.postMessage", channel=recipient, as_user=True, text=message_part
             )
 
     async def send_image_url(self, recipient_id, image_url, message=""):
         image_attachment = [{"image_url": image_url, "text": message}]
         recipient = self.slack_channel or recipient_id
-        return super(SlackBot, self).api_call(
+        return await self._api_call(
             "chat.postMessage",
             channel=recipient,
             as_user=True,
@@ -43,7 +194,7 @@ class SlackBot(SlackClient, OutputChannel):
 
     async def send_attachment(self, recipient_id, attachment, message=""):
         recipient = self.slack_channel or recipient_id
-        return super(SlackBot, self).api_call(
+        return await self._api_call(
             "chat.postMessage",
             channel=recipient,
             as_user=True,
@@ -51,25 +202,15 @@ class SlackBot(SlackClient, OutputChannel):
             attachments=attachment,
         )
 
-    @staticmethod
-    def _convert_to_slack_buttons(buttons):
-        return [
-            {
-                "text": b["title"],
-                "name": b["payload"],
-                "value": b["payload"],
-                "type": "button",
-            }
-            for b in buttons
-        ]
-
-    @staticmethod
-    def _get_text_from_slack_buttons(buttons):
-        return "".join([b.get("title", "") for b in buttons])
+    _convert_to_slack_buttons = staticmethod(_convert_to_slack_buttons)
+    _get_text_from_slack_buttons = staticmethod(_get_text_from_slack_buttons)
 
     async def send_text_with_buttons(self, recipient_id, message, buttons, **kwargs):
         recipient = self.slack_channel or recipient_id
 
+        if not buttons and message:
+            return await self.send_text_message(recipient, message)
+
         if len(buttons) > 5:
             logger.warning(
                 "Slack API currently allows only up to 5 buttons. "
@@ -78,20 +219,20 @@ class SlackBot(SlackClient, OutputChannel):
             return await self.send_text_message(recipient, message)
 
         if message:
-            callback_string = message.replace(" ", "_")[:20]
+            callback_string = message[:20].replace(" ", "_")
         else:
-            callback_string = self._get_text_from_slack_buttons(buttons)
-            callback_string = callback_string.replace(" ", "_")[:20]
+            callback_string = _get_text_from_slack_buttons(buttons)
+            callback_string = callback_string[:20].replace(" ", "_")
 
         button_attachment = [
             {
                 "fallback": message,
                 "callback_id": callback_string,
-                "actions": self._convert_to_slack_buttons(buttons),
+                "actions": _convert_to_slack_buttons(buttons),
             }
         ]
 
-        super(SlackBot, self).api_call(
+        return await self._api_call(
             "chat.postMessage",
             channel=recipient,
             as_user=True,
@@ -125,7 +266,7 @@ class SlackInput(InputChannel):
         Needs a couple of settings to properly authenticate and validate
         messages. Details to setup:
 
-        https://github.com/slackapi/python-slackclient
+        https://api.slack.com/bot-users
 
         Args:
             slack_token: Your Slack Authentication token. You can find or
@@ -142,100 +283,56 @@ class SlackInput(InputChannel):
         """
         self.slack_token = slack_token
         self.slack_channel = slack_channel
-        self.errors_ignore_retry = errors_ignore_retry or ("http_timeout",)
-
-    @staticmethod
-    def _is_user_message(slack_event):
-        return (
-            slack_event.get("event")
-            and (
-                slack_event.get("event").get("type") == u"message"
-                or slack_event.get("event").get("type") == u"app_mention"
-            )
-            and slack_event.get("event").get("text")
-            and not slack_event.get("event").get("bot_id")
-        )
-
-    @staticmethod
-    def _is_interactive_message(payload):
-        return payload["type"] == "interactive_message"
-
-    @staticmethod
-    def _is_button(payload):
-        return payload["actions"][0]["type"] == "button"
-
-    @staticmethod
-    def _is_button_reply(slack_event):
-        payload = json.loads(slack_event["payload"])
-        return SlackInput._is_interactive_message(payload) and SlackInput._is_button(
-            payload
-        )
-
-    @staticmethod
-    def _get_button_reply(slack_event):
-        return json.loads(slack_event["payload"])["actions"][0]["name"]
-
-    @staticmethod
-    def _sanitize_user_message(text, uids_to_remove):
-        """Remove superfluous/wrong/problematic tokens from a message.
-
-        Probably a good starting point for pre-formatting of user-provided text
-        to make NLU's life easier in case they go funky to the power of extreme
-
-        In the current state will just drop self-mentions of bot itself
-
-        Args:
-            text: raw message as sent from slack
-            uids_to_remove: a list of user ids to remove from the content
-
-        Returns:
-            str: parsed and cleaned version of the input text
-        """
-        for uid_to_remove in uids_to_remove:
-            # heuristic to format majority cases OK
-            # can be adjusted to taste later if needed,
-            # but is a good first approximation
-            for regex, replacement in [
-                (r"<@{}>\s".format(uid_to_remove), ""),
-                (r"\s<@{}>".format(uid_to_remove), ""),
-                # a bit arbitrary but probably OK
-                (r"<@{}>".format(uid_to_remove), " "),
-            ]:
-                text = re.sub(regex, replacement, text)
-
-        return text.rstrip().lstrip()  # drop extra spaces at beginning and end
+        self.errors_ignore_retry = frozenset(errors_ignore_retry or ("http_timeout",))
+        self._out_channel = None
+
+    # the helpers are module level functions, these aliases keep them
+    # available as static methods of the slack channels
+    _is_user_message = staticmethod(_is_user_message)
+    _is_interactive_message = staticmethod(_is_interactive_message)
+    _is_button = staticmethod(_is_button)
+    _is_button_reply_parsed = staticmethod(_is_button_reply_parsed)
+    _get_button_reply_parsed = staticmethod(_get_button_reply_parsed)
+    _sanitize_user_message = staticmethod(_sanitize_user_message)
 
     async def process_message(self, request: Request, on_new_message, text, sender_id):
         """Slack retries to post messages up to 3 times based on
         failure conditions defined here:
         https://api.slack.com/events-api#failure_conditions
         """
-        retry_reason = request.headers.get("HTTP_X_SLACK_RETRY_REASON")
-        retry_count = request.headers.get("HTTP_X_SLACK_RETRY_NUM")
+        retry_reason = request.headers.get("X-Slack-Retry-Reason")
+        retry_count = request.headers.get("X-Slack-Retry-Num")
         if retry_count and retry_reason in self.errors_ignore_retry:
             logger.warning(
                 "Received retry #{} request from slack"
                 " due to {}".format(retry_count, retry_reason)
             )
 
-            return response.text(None, status=201, headers={"X-Slack-No-Retry": 1})
+            return _no_retry_response()
 
         try:
-            out_channel = SlackBot(self.slack_token, self.slack_channel)
+            # reuse a single output channel so its client (and connections)
+            # are shared between messages
+            if self._out_channel is None:
+                self._out_channel = SlackBot(self.slack_token, self.slack_channel)
             user_msg = UserMessage(
-                text, out_channel, sender_id, input_channel=self.name()
+                text, self._out_channel, sender_id, input_channel=self.name()
             )
 
             await on_new_message(user_msg)
-        except Exception as e:
-            logger.error("Exception when trying to handle message.{0}".format(e))
-            logger.error(str(e), exc_info=True)
+        except Exception:
+            logger.exception("Exception when trying to handle message.")
 
-        return response.text("")
+        return _ok_response()
 
     def blueprint(self, on_new_message):
         slack_webhook = Blueprint("slack_webhook", __name__)
 
+        @slack_webhook.listener("after_server_stop")
+        async def close_out_channel(app, loop):
+            if self._out_channel is not None:
+                await self._out_channel.close()
+
         @slack_webhook.route("/", methods=["GET"])
         async def health(request):
             return response.json({"status": "ok"})
@@ -243,30 +340,32 @@ class SlackInput(InputChannel):
         @slack_webhook.route("/webhook", methods=["GET", "POST"])
         async def webhook(request: Request):
             if request.form:
-                output = dict(request.form)
-                if self._is_button_reply(output):
-                    sender_id = json.loads(output["payload"])["user"]["id"]
-                    return await self.process_message(
-                        request,
-                        on_new_message,
-                        text=self._get_button_reply(output),
-                        sender_id=sender_id,
-                    )
+                raw_payload = request.form.get("payload")
+                if raw_payload:
+                    payload = json_loads(raw_payload)
+                    if _is_button_reply_parsed(payload):
+                        return await self.process_message(
+                            request,
+                            on_new_message,
+                            text=_get_button_reply_parsed(payload),
+                            sender_id=payload["user"]["id"],
+                        )
             elif request.json:
                 output = request.json
                 if "challenge" in output:
                     return response.json(output.get("challenge"))
 
-                elif self._is_user_message(output):
+                elif _is_user_message(output):
+                    event = output["event"]
                     return await self.process_message(
                         request,
                         on_new_message,
-                        text=self._sanitize_user_message(
-                            output["event"]["text"], output["authed_users"]
+                        text=_sanitize_user_message(
+                            event["text"], output["authed_users"]
                         ),
-                        sender_id=output.get("event").get("user"),
+                        sender_id=event.get("user"),
                     )
 
-            return response.text("")
+            return _ok_response()
 
         return slack_webhook
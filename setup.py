@@ -55,7 +55,6 @@ install_requires = [
     "coloredlogs~=10.0",
     "ruamel.yaml~=0.15.0",
     "scikit-learn~=0.20.0",
-    "slackclient~=1.0",
     "python-telegram-bot~=11.0",
     "twilio~=6.0",
     "webexteamssdk~=1.0",
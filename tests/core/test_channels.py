@@ -531,6 +531,25 @@ def test_slack_message_sanitization():
     )
 
 
+def test_slack_message_sanitization_multiple_uids():
+    from rasa.core.channels.slack import SlackInput
+
+    message = "<@U123> Hey <@U456>, you can sit here{}if you want".format("<@U123>")
+
+    assert (
+        SlackInput._sanitize_user_message(message, ["U123", "U456"])
+        == "Hey, you can sit here if you want"
+    )
+    assert SlackInput._sanitize_user_message(message, []) == message
+
+
+def test_slack_message_sanitization_other_whitespace():
+    from rasa.core.channels.slack import SlackInput
+
+    assert SlackInput._sanitize_user_message("hi\n<@U1>\nthere", ["U1"]) == "hi\nthere"
+    assert SlackInput._sanitize_user_message("a\t<@U1>\tb", ["U1"]) == "a\tb"
+
+
 def test_slack_init_one_parameter():
     from rasa.core.channels.slack import SlackInput
 
@@ -547,6 +566,58 @@ def test_slack_init_two_parameters():
     assert ch.slack_channel == "test"
 
 
+def test_slack_ignores_retry_due_to_http_timeout():
+    from rasa.core.channels.slack import SlackInput
+    import rasa.core
+
+    input_channel = SlackInput("xoxb-test")
+
+    app = Sanic(__name__)
+    rasa.core.channels.channel.register([input_channel], app, route="/webhooks/")
+
+    event = {"type": "message", "user": "U2147483697", "text": "Hello world"}
+    _, res = app.test_client.post(
+        "/webhooks/slack/webhook",
+        data=json.dumps({"event": event, "authed_users": []}),
+        headers={
+            "Content-Type": "application/json",
+            "X-Slack-Retry-Num": "1",
+            "X-Slack-Retry-Reason": "http_timeout",
+        },
+    )
+
+    assert res.status == 201
+    assert res.headers.get("X-Slack-No-Retry") == "1"
+
+
+def test_slack_button_reply_webhook():
+    from rasa.core.channels.slack import SlackInput
+
+    messages = []
+
+    async def on_new_message(message):
+        messages.append(message)
+
+    input_channel = SlackInput("xoxb-test")
+
+    app = Sanic(__name__)
+    app.blueprint(input_channel.blueprint(on_new_message), url_prefix="/webhooks/slack")
+
+    payload = {
+        "type": "interactive_message",
+        "actions": [{"type": "button", "name": "/affirm", "value": "/affirm"}],
+        "user": {"id": "U2147483697"},
+    }
+    _, res = app.test_client.post(
+        "/webhooks/slack/webhook", data={"payload": json.dumps(payload)}
+    )
+
+    assert res.status == 200
+    assert len(messages) == 1
+    assert messages[0].text == "/affirm"
+    assert messages[0].sender_id == "U2147483697"
+
+
 def test_is_slack_message_none():
     from rasa.core.channels.slack import SlackInput
 
@@ -586,6 +657,22 @@ def test_is_slack_message_false():
     assert SlackInput._is_user_message(slack_message) is False
 
 
+def test_slack_button_reply():
+    from rasa.core.channels.slack import SlackInput
+
+    payload = {
+        "type": "interactive_message",
+        "actions": [{"type": "button", "name": "/affirm", "value": "/affirm"}],
+        "user": {"id": "U2147483697"},
+    }
+
+    assert SlackInput._is_button_reply_parsed(payload)
+    assert SlackInput._get_button_reply_parsed(payload) == "/affirm"
+
+    payload["type"] = "dialog_submission"
+    assert not SlackInput._is_button_reply_parsed(payload)
+
+
 def test_slackbot_init_one_parameter():
     from rasa.core.channels.slack import SlackBot
 
@@ -602,185 +689,306 @@ def test_slackbot_init_two_parameter():
     assert bot.slack_channel == "General"
 
 
-# Use monkeypatch for sending attachments, images and plain text.
-@pytest.mark.filterwarnings("ignore:" "unclosed.*:" "ResourceWarning")
+async def test_slack_closes_out_channel_after_server_stop():
+    from rasa.core.channels.slack import SlackInput, SlackBot
+
+    input_channel = SlackInput("xoxb-test")
+    bot = SlackBot("xoxb-test")
+    session = bot._get_session()
+    input_channel._out_channel = bot
+
+    slack_webhook = input_channel.blueprint(on_new_message=None)
+    for listener in slack_webhook.listeners["after_server_stop"]:
+        await listener(None, None)
+
+    assert session.closed
+
+
 async def test_slackbot_send_attachment_only():
     from rasa.core.channels.slack import SlackBot
 
-    httpretty.register_uri(
-        httpretty.POST,
-        "https://slack.com/api/chat.postMessage",
-        body='{"ok":true,"purpose":"Testing bots"}',
-    )
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+        )
 
-    httpretty.enable()
+        bot = SlackBot("DummyToken", "General")
+        attachment = json.dumps(
+            [
+                {
+                    "fallback": "Financial Advisor Summary",
+                    "color": "#36a64f",
+                    "author_name": "ABE",
+                    "title": "Financial Advisor Summary",
+                    "title_link": "http://tenfactorialrocks.com",
+                    "image_url": "https://r.com/cancel/r12",
+                    "thumb_url": "https://r.com/cancel/r12",
+                    "actions": [
+                        {
+                            "type": "button",
+                            "text": "\ud83d\udcc8 Dashboard",
+                            "url": "https://r.com/cancel/r12",
+                            "style": "primary",
+                        },
+                        {
+                            "type": "button",
+                            "text": "\ud83d\udccb Download XL",
+                            "url": "https://r.com/cancel/r12",
+                            "style": "danger",
+                        },
+                        {
+                            "type": "button",
+                            "text": "\ud83d\udce7 E-Mail",
+                            "url": "https://r.com/cancel/r12",
+                            "style": "danger",
+                        },
+                    ],
+                    "footer": "Powered by 1010rocks",
+                    "ts": 1531889719,
+                }
+            ]
+        )
+        await bot.send_attachment("ID", attachment)
+        await bot.close()
 
-    bot = SlackBot("DummyToken", "General")
-    attachment = json.dumps(
-        [
-            {
-                "fallback": "Financial Advisor Summary",
-                "color": "#36a64f",
-                "author_name": "ABE",
-                "title": "Financial Advisor Summary",
-                "title_link": "http://tenfactorialrocks.com",
-                "image_url": "https://r.com/cancel/r12",
-                "thumb_url": "https://r.com/cancel/r12",
-                "actions": [
-                    {
-                        "type": "button",
-                        "text": "\ud83d\udcc8 Dashboard",
-                        "url": "https://r.com/cancel/r12",
-                        "style": "primary",
-                    },
-                    {
-                        "type": "button",
-                        "text": "\ud83d\udccb Download XL",
-                        "url": "https://r.com/cancel/r12",
-                        "style": "danger",
-                    },
-                    {
-                        "type": "button",
-                        "text": "\ud83d\udce7 E-Mail",
-                        "url": "https://r.com/cancel/r12",
-                        "style": "danger",
-                    },
-                ],
-                "footer": "Powered by 1010rocks",
-                "ts": 1531889719,
-            }
-        ]
-    )
-    await bot.send_attachment("ID", attachment)
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
 
-    httpretty.disable()
+        assert r
+        assert r[-1].kwargs["data"] == {
+            "channel": "General",
+            "as_user": True,
+            "text": "",
+            "attachments": attachment,
+        }
 
-    r = httpretty.latest_requests[-1]
 
-    assert r.parsed_body == {
-        "channel": ["General"],
-        "as_user": ["True"],
-        "attachments": [attachment],
-    }
+async def test_slackbot_send_attachment_withtext():
+    from rasa.core.channels.slack import SlackBot
 
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+        )
 
-@pytest.mark.filterwarnings("ignore:" "unclosed.*:" "ResourceWarning")
-async def test_slackbot_send_attachment_withtext():
+        bot = SlackBot("DummyToken", "General")
+        text = "Sample text"
+        attachment = json.dumps(
+            [
+                {
+                    "fallback": "Financial Advisor Summary",
+                    "color": "#36a64f",
+                    "author_name": "ABE",
+                    "title": "Financial Advisor Summary",
+                    "title_link": "http://tenfactorialrocks.com",
+                    "image_url": "https://r.com/cancel/r12",
+                    "thumb_url": "https://r.com/cancel/r12",
+                    "actions": [
+                        {
+                            "type": "button",
+                            "text": "\ud83d\udcc8 Dashboard",
+                            "url": "https://r.com/cancel/r12",
+                            "style": "primary",
+                        },
+                        {
+                            "type": "button",
+                            "text": "\ud83d\udccb XL",
+                            "url": "https://r.com/cancel/r12",
+                            "style": "danger",
+                        },
+                        {
+                            "type": "button",
+                            "text": "\ud83d\udce7 E-Mail",
+                            "url": "https://r.com/cancel/r123",
+                            "style": "danger",
+                        },
+                    ],
+                    "footer": "Powered by 1010rocks",
+                    "ts": 1531889719,
+                }
+            ]
+        )
+
+        await bot.send_attachment("ID", attachment, text)
+        await bot.close()
+
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
+
+        assert r
+        assert r[-1].kwargs["data"] == {
+            "channel": "General",
+            "as_user": True,
+            "text": "Sample text",
+            "attachments": attachment,
+        }
+
+
+async def test_slackbot_send_image_url():
     from rasa.core.channels.slack import SlackBot
 
-    httpretty.register_uri(
-        httpretty.POST,
-        "https://slack.com/api/chat.postMessage",
-        body='{"ok":true,"purpose":"Testing bots"}',
-    )
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+        )
 
-    httpretty.enable()
+        bot = SlackBot("DummyToken", "General")
+        url = json.dumps([{"URL": "http://www.rasa.net"}])
+        await bot.send_image_url("ID", url)
+        await bot.close()
 
-    bot = SlackBot("DummyToken", "General")
-    text = "Sample text"
-    attachment = json.dumps(
-        [
-            {
-                "fallback": "Financial Advisor Summary",
-                "color": "#36a64f",
-                "author_name": "ABE",
-                "title": "Financial Advisor Summary",
-                "title_link": "http://tenfactorialrocks.com",
-                "image_url": "https://r.com/cancel/r12",
-                "thumb_url": "https://r.com/cancel/r12",
-                "actions": [
-                    {
-                        "type": "button",
-                        "text": "\ud83d\udcc8 Dashboard",
-                        "url": "https://r.com/cancel/r12",
-                        "style": "primary",
-                    },
-                    {
-                        "type": "button",
-                        "text": "\ud83d\udccb XL",
-                        "url": "https://r.com/cancel/r12",
-                        "style": "danger",
-                    },
-                    {
-                        "type": "button",
-                        "text": "\ud83d\udce7 E-Mail",
-                        "url": "https://r.com/cancel/r123",
-                        "style": "danger",
-                    },
-                ],
-                "footer": "Powered by 1010rocks",
-                "ts": 1531889719,
-            }
-        ]
-    )
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
 
-    await bot.send_attachment("ID", attachment, text)
+        assert r
+        data = r[-1].kwargs["data"]
+        assert data["as_user"] is True
+        assert data["channel"] == "General"
+        assert '"text": ""' in data["attachments"]
+        assert (
+            '"image_url": "[{\\"URL\\": \\"http://www.rasa.net\\"}]"'
+            in data["attachments"]
+        )
 
-    httpretty.disable()
 
-    r = httpretty.latest_requests[-1]
+async def test_slackbot_send_text():
+    from rasa.core.channels.slack import SlackBot
 
-    assert r.parsed_body == {
-        "channel": ["General"],
-        "as_user": ["True"],
-        "text": ["Sample text"],
-        "attachments": [attachment],
-    }
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+        )
 
+        bot = SlackBot("DummyToken", "General")
+        await bot.send_text_message("ID", "my message")
+        await bot.close()
 
-@pytest.mark.filterwarnings("ignore:" "unclosed.*:" "ResourceWarning")
-async def test_slackbot_send_image_url():
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
+
+        assert r
+        assert r[-1].kwargs["data"] == {
+            "as_user": True,
+            "channel": "General",
+            "text": "my message",
+        }
+
+
+async def test_slackbot_send_text_in_parts():
     from rasa.core.channels.slack import SlackBot
 
-    httpretty.register_uri(
-        httpretty.POST,
-        "https://slack.com/api/chat.postMessage",
-        body='{"ok":true,"purpose":"Testing bots"}',
-    )
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+            repeat=True,
+        )
 
-    httpretty.enable()
+        bot = SlackBot("DummyToken", "General")
+        await bot.send_text_message("ID", "first\n\nsecond\n\nthird")
+        await bot.close()
 
-    bot = SlackBot("DummyToken", "General")
-    url = json.dumps([{"URL": "http://www.rasa.net"}])
-    await bot.send_image_url("ID", url)
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
 
-    httpretty.disable()
+        assert r
+        assert [req.kwargs["data"]["text"] for req in r] == ["first", "second", "third"]
 
-    r = httpretty.latest_requests[-1]
 
-    assert r.parsed_body["as_user"] == ["True"]
-    assert r.parsed_body["channel"] == ["General"]
-    assert len(r.parsed_body["attachments"]) == 1
-    assert '"text": ""' in r.parsed_body["attachments"][0]
-    assert (
-        '"image_url": "[{\\"URL\\": \\"http://www.rasa.net\\"}]"'
-        in r.parsed_body["attachments"][0]
-    )
+async def test_slackbot_send_text_with_no_buttons():
+    from rasa.core.channels.slack import SlackBot
+
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+        )
 
+        bot = SlackBot("DummyToken", "General")
+        await bot.send_text_with_buttons("ID", "my message", [])
+        await bot.close()
 
-@pytest.mark.filterwarnings("ignore:" "unclosed.*:" "ResourceWarning")
-async def test_slackbot_send_text():
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
+
+        assert r
+        assert r[-1].kwargs["data"] == {
+            "as_user": True,
+            "channel": "General",
+            "text": "my message",
+        }
+
+
+async def test_slackbot_send_no_text_and_no_buttons():
     from rasa.core.channels.slack import SlackBot
 
-    httpretty.register_uri(
-        httpretty.POST,
-        "https://slack.com/api/chat.postMessage",
-        body='{"ok":true,"purpose":"Testing bots"}',
-    )
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+        )
 
-    httpretty.enable()
+        bot = SlackBot("DummyToken", "General")
+        await bot.send_text_with_buttons("ID", None, [])
+        await bot.close()
 
-    bot = SlackBot("DummyToken", "General")
-    await bot.send_text_message("ID", "my message")
-    httpretty.disable()
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
+
+        assert r
+        assert "text" not in r[-1].kwargs["data"]
 
-    r = httpretty.latest_requests[-1]
 
-    assert r.parsed_body == {
-        "as_user": ["True"],
-        "channel": ["General"],
-        "text": ["my message"],
-    }
+async def test_slackbot_api_call():
+    from rasa.core.channels.slack import SlackBot
+
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+        )
+
+        bot = SlackBot("DummyToken", "General")
+        result = await bot.api_call("chat.postMessage", channel="General", text="hi")
+        await bot.close()
+
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
+
+        assert r
+        assert r[-1].kwargs["data"] == {"channel": "General", "text": "hi"}
+        assert result == {"ok": True, "purpose": "Testing bots"}
+
+
+async def test_slackbot_send_buttons_without_text():
+    from rasa.core.channels.slack import SlackBot
+
+    with aioresponses() as mocked:
+        mocked.post(
+            "https://slack.com/api/chat.postMessage",
+            payload={"ok": True, "purpose": "Testing bots"},
+        )
+
+        bot = SlackBot("DummyToken", "General")
+        buttons = [{"title": "Yes", "payload": "/affirm"}]
+        await bot.send_text_with_buttons("ID", None, buttons)
+        await bot.close()
+
+        r = latest_request(mocked, "post", "https://slack.com/api/chat.postMessage")
+
+        assert r
+        data = r[-1].kwargs["data"]
+        assert "text" not in data
+        assert json.loads(data["attachments"]) == [
+            {
+                "fallback": None,
+                "callback_id": "Yes",
+                "actions": [
+                    {
+                        "text": "Yes",
+                        "name": "/affirm",
+                        "value": "/affirm",
+                        "type": "button",
+                    }
+                ],
+            }
+        ]
 
 
 @pytest.mark.filterwarnings("ignore:" "unclosed.*:" "ResourceWarning")